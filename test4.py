@@ -1,23 +1,30 @@
 import sys
 import os
+import io
+import json
 import shutil
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                                QHBoxLayout, QPushButton, QFileDialog, QComboBox,
                                QTreeView, QAbstractItemView, QHeaderView, QLabel, QMessageBox)
-from PySide6.QtCore import Qt, QAbstractItemModel, QModelIndex
+from PySide6.QtCore import Qt, QAbstractItemModel, QModelIndex, QObject, QThread, QTimer, Signal, Slot
 from PySide6.QtGui import QStandardItemModel, QStandardItem
 
 import vtk
 from vtkmodules.vtkCommonColor import vtkNamedColors
-from vtkmodules.vtkIOImage import vtkDICOMImageReader
+from vtkmodules.vtkCommonDataModel import vtkImageData
 from vtkmodules.vtkInteractionImage import vtkImageViewer2
 from vtkmodules.vtkRenderingCore import (vtkActor2D, vtkRenderWindowInteractor,
                                          vtkTextMapper, vtkTextProperty)
 from vtkmodules.vtkImagingCore import vtkImageReslice
 from vtkmodules.qt.QVTKRenderWindowInteractor import QVTKRenderWindowInteractor
+from vtkmodules.util import numpy_support
+from vtkmodules.util.vtkConstants import VTK_SHORT
 
 from pymongo import MongoClient
+import gridfs
 from bson import ObjectId
 import pydicom
 import numpy as np
@@ -28,6 +35,236 @@ from upload import upload_folder
 
 load_dotenv()
 MONGODB_URL = os.getenv("MONGODB_URL")
+# Size limit of the on-disk volume cache, defaults to a quarter of the free disk space
+VOLUME_CACHE_MAX_BYTES = os.getenv("VOLUME_CACHE_MAX_BYTES")
+
+DEFAULT_WINDOW_WIDTH = 400  # Default values (soft tissue window)
+DEFAULT_WINDOW_LEVEL = 50
+
+# Instances fetched per query for uploads that keep their bytes inline
+INLINE_BATCH_SIZE = 32
+
+_MONGO = None
+
+
+def get_mongo():
+    """Return the MongoClient shared by every archive dialog, created on first use"""
+    global _MONGO
+    if _MONGO is None:
+        # zstd is skipped with a warning when the zstandard package is not installed
+        _MONGO = MongoClient(MONGODB_URL, maxPoolSize=16, compressors='zstd')
+    return _MONGO
+
+
+def read_window_settings(ds, volume):
+    """Read window width and level from a DICOM dataset, falls back to the stacked
+    volume's pixels, returns (ww, wl)"""
+    window_width_element = ds.get((0x0028, 0x1051), None)
+    window_level_element = ds.get((0x0028, 0x1050), None)
+
+    if window_width_element and window_level_element:
+        # Convert to string and split multi-values (e.g., "400\2000")
+        ww_str = str(window_width_element.value).split('\\')[0]
+        wl_str = str(window_level_element.value).split('\\')[0]
+
+        try:
+            window_width = float(ww_str)
+            window_level = float(wl_str)
+            print(f"Using DICOM metadata WW/WL: WW={window_width}, WL={window_level}")
+            return window_width, window_level
+        except (ValueError, TypeError):
+            # Fallback to auto-calculation if conversion fails
+            pass
+
+    return calculate_window_from_volume(volume)
+
+
+def calculate_window_from_volume(volume):
+    """Calculate WW/WL from the 1st-99th percentile of a rescaled (slices, rows, columns) volume"""
+    # A handful of evenly spaced slices keeps the percentile sort small
+    pixel_data = volume[::max(volume.shape[0] // 16, 1)]
+    # Percentiles of every 4th row/column are within a fraction of a percent of the full image
+    if pixel_data.shape[-2] * pixel_data.shape[-1] > 1_000_000:
+        pixel_data = pixel_data[..., ::4, ::4]
+
+    # Percentiles ignore outliers such as metal or air that skew a plain min/max
+    low, high = np.percentile(pixel_data, [1, 99])
+
+    window_level = (high + low) * 0.5
+    window_width = max(high - low, 1.0)
+    print(f"Auto-calculated WW/WL: WW={window_width}, WL={window_level}")
+    return float(window_width), float(window_level)
+
+
+def read_datasets(dicom_files):
+    """Parse DICOM files in parallel, pixel decoding uses whichever pydicom handler is installed"""
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        return list(executor.map(pydicom.dcmread, dicom_files))
+
+
+def frame_count(ds):
+    """Number of frames in a dataset, single-frame files have no NumberOfFrames"""
+    return int(getattr(ds, 'NumberOfFrames', 1) or 1)
+
+
+def decode_frames(ds, out):
+    """Decode a dataset's pixel data as rescaled int16 into out (frames, rows, columns)"""
+    frames = ds.pixel_array.reshape(-1, ds.Rows, ds.Columns)
+    # The volume holds the pixels from here on, drop the encoded bytes and pydicom's cached array
+    del ds.PixelData
+    ds._pixel_array = None
+
+    # Apply this dataset's own modality rescale so values match the WW/WL stored in the header
+    slope = float(getattr(ds, 'RescaleSlope', 1) or 1)
+    intercept = float(getattr(ds, 'RescaleIntercept', 0) or 0)
+    info = np.iinfo(np.int16)
+
+    # One frame at a time keeps the wide temporaries to a single slice
+    for i, frame in enumerate(frames):
+        if slope == 1 and intercept.is_integer():
+            # Integer intercepts (e.g. -1024 on CT) stay exact in int32
+            rescaled = frame.astype(np.int32)
+            rescaled += int(intercept)
+        else:
+            rescaled = frame.astype(np.float32)
+            rescaled *= slope
+            rescaled += intercept
+
+        # Clip before narrowing so out-of-range values saturate instead of wrapping
+        np.clip(rescaled, info.min, info.max, out=rescaled)
+        out[i] = rescaled
+
+
+def stack_datasets(datasets):
+    """Stack a series into a (slices, rows, columns) int16 volume, returns (volume, spacing)"""
+    datasets = sorted(datasets, key=lambda ds: int(getattr(ds, 'InstanceNumber', 0) or 0))
+    first = datasets[0]
+
+    # Allocate the volume once, multi-frame files contribute several slices each
+    volume = np.empty((sum(frame_count(ds) for ds in datasets), first.Rows, first.Columns), dtype=np.int16)
+    slices = []
+    start = 0
+    for ds in datasets:
+        slices.append(volume[start:start + frame_count(ds)])
+        start += frame_count(ds)
+
+    # Decode slices on a thread pool, each dataset writes straight into its part of the volume
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(decode_frames, datasets, slices))
+
+    pixel_spacing = getattr(first, 'PixelSpacing', None) or [1, 1]
+    slice_spacing = getattr(first, 'SpacingBetweenSlices', None) or getattr(first, 'SliceThickness', None) or 1
+    spacing = (float(pixel_spacing[1]), float(pixel_spacing[0]), float(slice_spacing))
+
+    return volume, spacing
+
+
+def volume_to_image_data(volume, spacing):
+    """Wrap a (slices, rows, columns) volume as vtkImageData, returns (volume, image_data)"""
+    # The returned volume backs the VTK scalars (no copy), keep it alive with the image data
+    # VTK images start at the bottom row, DICOM rows run top to bottom
+    volume = np.ascontiguousarray(volume[:, ::-1, :], dtype=np.int16)
+
+    image_data = vtkImageData()
+    image_data.SetDimensions(volume.shape[2], volume.shape[1], volume.shape[0])
+    image_data.SetSpacing(*spacing)
+    scalars = numpy_support.numpy_to_vtk(volume.ravel(), deep=False, array_type=VTK_SHORT)
+    image_data.GetPointData().SetScalars(scalars)
+
+    return volume, image_data
+
+
+def load_cached_volume(cache_path, cache_key):
+    """Load a cached volume, returns (volume, spacing, (ww, wl)) or None on a miss,
+    entries saved under a different cache_key are stale and count as a miss"""
+    meta_path = os.path.splitext(cache_path)[0] + '.json'
+    # The sidecar is written last, so its presence means the volume is complete
+    if not os.path.exists(cache_path) or not os.path.exists(meta_path):
+        return None
+
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get('key') != cache_key:
+            print(f"Cached volume {cache_path} is out of date")
+            return None
+        volume = np.load(cache_path, mmap_mode='r')
+        # Touch the entry so eviction sees it as recently used
+        os.utime(cache_path)
+    except Exception as e:
+        print(f"Error reading cached volume {cache_path}: {str(e)}")
+        return None
+
+    return volume, tuple(meta['spacing']), (meta['window_width'], meta['window_level'])
+
+
+def replace_cache_file(path, write, mode='wb'):
+    """Write a cache file under a temporary name with write(f) and swap it into place"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode) as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+
+def save_cached_volume(cache_path, volume, spacing, window_width, window_level, cache_key):
+    """Store a stacked volume and its display settings in the volume cache, cache_key
+    identifies the series contents it was built from"""
+    meta_path = os.path.splitext(cache_path)[0] + '.json'
+    # Drop any old sidecar first and swap each file in whole, so a sidecar never
+    # pairs with a half-written volume
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    replace_cache_file(cache_path, lambda f: np.save(f, volume))
+    meta = {'key': cache_key, 'spacing': list(spacing),
+            'window_width': window_width, 'window_level': window_level}
+    replace_cache_file(meta_path, lambda f: json.dump(meta, f), mode='w')
+
+    cache_dir = os.path.dirname(cache_path)
+    max_cache_bytes = int(VOLUME_CACHE_MAX_BYTES) if VOLUME_CACHE_MAX_BYTES else None
+    evict_volume_cache(cache_dir, max_cache_bytes, keep=cache_path)
+
+
+def evict_volume_cache(cache_dir, max_cache_bytes=None, keep=None):
+    """Remove least recently used volumes until the cache fits in max_cache_bytes"""
+    if max_cache_bytes is None:
+        max_cache_bytes = shutil.disk_usage(cache_dir).free // 4
+
+    entries = []
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            if entry.name.endswith('.npy') and entry.is_file():
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_cache_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            meta_path = os.path.splitext(path)[0] + '.json'
+            if os.path.exists(meta_path):
+                os.remove(meta_path)
+            os.remove(path)
+            total -= size
+        except Exception as e:
+            print(f"Warning: Could not evict {path}: {e}")
+
+
+def remove_partial_cache_files(cache_dir):
+    """Remove temporary files left behind by a cache write that was cut short"""
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            if entry.name.endswith('.tmp') and entry.is_file():
+                try:
+                    os.remove(entry.path)
+                except Exception as e:
+                    print(f"Warning: Could not remove {entry.name}: {e}")
 
 
 class CustomInteractorStyle(vtk.vtkInteractorStyleImage):
@@ -41,6 +278,19 @@ class CustomInteractorStyle(vtk.vtkInteractorStyleImage):
         self.slice = image_viewer.GetSliceMin()
         self.min_slice = image_viewer.GetSliceMin()
         self.max_slice = image_viewer.GetSliceMax()
+
+        # Coalesce bursts of wheel/key events into one render, 15 ms is under one 60 Hz frame
+        self._render_timer = QTimer()
+        self._render_timer.setSingleShot(True)
+        self._render_timer.setInterval(15)
+        self._render_timer.timeout.connect(self._do_render)
+
+    def reset_slice_range(self):
+        """Pick up the slice range after the viewer's input or orientation changed"""
+        self._render_timer.stop()
+        self.slice = self.image_viewer.GetSlice()
+        self.min_slice = self.image_viewer.GetSliceMin()
+        self.max_slice = self.image_viewer.GetSliceMax()
         self.update_status_message()
 
     def update_status_message(self):
@@ -50,16 +300,23 @@ class CustomInteractorStyle(vtk.vtkInteractorStyleImage):
     def move_slice_forward(self, obj, event):
         if self.slice < self.max_slice:
             self.slice += 1
-            self.image_viewer.SetSlice(self.slice)
-            self.update_status_message()
-            self.image_viewer.Render()
+            self.schedule_render()
 
     def move_slice_backward(self, obj, event):
         if self.slice > self.min_slice:
             self.slice -= 1
-            self.image_viewer.SetSlice(self.slice)
-            self.update_status_message()
-            self.image_viewer.Render()
+            self.schedule_render()
+
+    def schedule_render(self):
+        # Not restarting a running timer keeps a long scroll rendering every 15 ms
+        # instead of waiting for the wheel to stop
+        if not self._render_timer.isActive():
+            self._render_timer.start()
+
+    def _do_render(self):
+        # SetSlice renders, so update the status text first
+        self.update_status_message()
+        self.image_viewer.SetSlice(self.slice)
 
     def key_press_event(self, obj, event):
         key = self.GetInteractor().GetKeySym()
@@ -69,13 +326,87 @@ class CustomInteractorStyle(vtk.vtkInteractorStyleImage):
             self.move_slice_backward(obj, event)
 
 
+class DicomLoadWorker(QObject):
+    """Reads a DICOM series off the UI thread"""
+    finished = Signal(object, object, float, float, bool)
+    failed = Signal(str)
+
+    def __init__(self, dicom_files=None, fetch_datasets=None, volume=None, spacing=None,
+                 window_settings=None, cache_path=None, cache_key=None):
+        super().__init__()
+        self.dicom_files = dicom_files
+        self.fetch_datasets = fetch_datasets
+        self.volume = volume
+        self.spacing = spacing
+        self.window_settings = window_settings
+        self.cache_path = cache_path
+        self.cache_key = cache_key
+
+    @Slot()
+    def run(self):
+        try:
+            if self.volume is not None:
+                datasets = None
+                volume, spacing = self.volume, self.spacing
+                # Only run() holds the 16-bit volume, it is released once the cache is written
+                self.volume = None
+            else:
+                datasets = self.fetch_datasets() if self.fetch_datasets else read_datasets(self.dicom_files)
+                volume, spacing = stack_datasets(datasets)
+
+            # set window width and level, window_computed marks values read from this series
+            window_computed = False
+            if self.window_settings:
+                window_width, window_level = self.window_settings
+            else:
+                try:
+                    window_width, window_level = read_window_settings(datasets[0], volume)
+                    window_computed = True
+                except Exception as e:
+                    print(f"Error setting window width and level: {str(e)}")
+                    window_width, window_level = DEFAULT_WINDOW_WIDTH, DEFAULT_WINDOW_LEVEL
+            # The stacked volume holds all the pixels, the parsed datasets aren't needed anymore
+            datasets = None
+
+            # vtkImageViewer2 maps WW/WL per displayed slice, hand it the rescaled values
+            oriented, image_data = volume_to_image_data(volume, spacing)
+
+            # Verify data
+            dimensions = image_data.GetDimensions()
+            if dimensions[0] == 0 or dimensions[1] == 0 or dimensions[2] == 0:
+                raise ValueError("No valid DICOM data found")
+
+            self.finished.emit(oriented, image_data, window_width, window_level, window_computed)
+
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+
+        # Cache after the series is on screen so the write doesn't delay the first display
+        if self.cache_path:
+            try:
+                save_cached_volume(self.cache_path, volume, spacing, window_width, window_level,
+                                   self.cache_key)
+            except Exception as e:
+                print(f"Error caching volume: {str(e)}")
+
+
 class DICOMViewerWidget(QWidget):
+    series_loaded = Signal(object, float, float, bool)
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.colors = vtkNamedColors()
         self.dicom_folder = ""
         self.view_orientation = "axial"
         self.dicom_files = []
+        self._loading = False
+        self._load_source = None
+        # Loader threads still running, a worker keeps writing the volume cache after it reports back
+        self._load_threads = set()
+        # Backs the VTK scalars of image_data, which share its memory
+        self.volume = None
+        self.image_data = None
 
         # Use appdata/local directory instead of temp directory
         self.app_data_dir = os.path.join(
@@ -86,6 +417,8 @@ class DICOMViewerWidget(QWidget):
 
         # Create directory if it doesn't exist
         os.makedirs(self.app_data_dir, exist_ok=True)
+        # No loader is running yet, so any temporary file is from a write that never finished
+        remove_partial_cache_files(self.app_data_dir)
         print(f"created directory{self.app_data_dir }")
 
         # Setup UI
@@ -94,8 +427,8 @@ class DICOMViewerWidget(QWidget):
         # Initialize VTK components
         self.setup_vtk()
 
-        self.window_width = 400  # Default values (soft tissue window)
-        self.window_level = 50
+        self.window_width = DEFAULT_WINDOW_WIDTH
+        self.window_level = DEFAULT_WINDOW_LEVEL
 
     def clear_cache(self):
         """Clear the cache directory of DICOM files"""
@@ -160,6 +493,19 @@ class DICOMViewerWidget(QWidget):
         renderer.AddActor2D(self.usage_text_actor)
         renderer.SetBackground(self.colors.GetColor3d('Black'))
 
+        # Attach to the widget so the text actors show before any data is loaded
+        self.image_viewer.SetRenderWindow(self.vtk_widget.GetRenderWindow())
+        self.image_viewer.SetupInteractor(self.interactor)
+
+        # Set custom interactor style, it is kept for the lifetime of the widget
+        self.interactor_style = CustomInteractorStyle(self.image_viewer, self.slice_text_actor)
+        self.interactor.SetInteractorStyle(self.interactor_style)
+
+        # Reslice for coronal/sagittal views, only its axes change with the orientation
+        self.reslice = vtkImageReslice()
+        self.reslice.SetOutputSpacing(1, 1, 1)
+        self.reslice.SetInterpolationModeToLinear()
+
     def create_text_actor(self, text, x, y, font_size, align_bottom=False, normalized=False):
         """Helper function to create text actors"""
         text_prop = vtkTextProperty()
@@ -192,176 +538,159 @@ class DICOMViewerWidget(QWidget):
 
     def open_dicom_folder(self):
         """Open a dialog to select DICOM folder"""
+        if self._loading:
+            return
         folder = QFileDialog.getExistingDirectory(self, "Select DICOM Folder")
         if folder:
             self.load_dicom_series(folder)
 
-    def set_ww_wl(self):
-        """ this set the correct window level and width"""
-        try:
-            # Read first DICOM file for metadata
-            first_file = self.dicom_files[0]
-            ds = pydicom.dcmread(first_file, stop_before_pixels=False)
-            window_width_element = ds.get((0x0028, 0x1051), None)
-            window_level_element = ds.get((0x0028, 0x1050), None)
-
-            if window_width_element and window_level_element:
-                # Convert to string and split multi-values (e.g., "400\2000")
-                ww_str = str(window_width_element.value).split('\\')[0]
-                wl_str = str(window_level_element.value).split('\\')[0]
-
-                try:
-                    self.window_width = float(ww_str)
-                    self.window_level = float(wl_str)
-                    print(f"Using DICOM metadata WW/WL: WW={self.window_width}, WL={self.window_level}")
-                except (ValueError, TypeError):
-                    # Fallback to auto-calculation if conversion fails
-                    self.calculate_window_from_pixels(ds)
-            else:
-                self.calculate_window_from_pixels(ds)
-
-        except Exception as e :
-            print(f"Error setting window width and level: {str(e)}")
-
-    def calculate_window_from_pixels(self, ds):
-        """Calculate WW/WL from pixel data"""
-        pixel_data = ds.pixel_array
-        min_val = pixel_data.min()
-        max_val = pixel_data.max()
-        self.window_level = (max_val + min_val) / 2.0
-        self.window_width = max_val - min_val
-        print(f"Auto-calculated WW/WL: WW={self.window_width}, WL={self.window_level}")
-
     def load_dicom_series(self, folder_path):
         """Load DICOM series from the specified folder"""
         try:
             self.dicom_folder = folder_path
-            self.dicom_files = [os.path.join(folder_path, f) for f in os.listdir(folder_path)
-                                if f.lower().endswith('.dcm')]
+            with os.scandir(folder_path) as entries:
+                self.dicom_files = [entry.path for entry in entries
+                                    if entry.name.endswith(('.dcm', '.DCM')) and entry.is_file()]
 
             if not self.dicom_files:
                 raise ValueError("No DICOM files found in the selected folder")
 
-            # set window width and level
-            self.set_ww_wl()
-
-            # Create reader
-            self.reader = vtkDICOMImageReader()
-            self.reader.SetDirectoryName(self.dicom_folder)
-            self.reader.Update()
-
-            # Verify data
-            dimensions = self.reader.GetOutput().GetDimensions()
-            if dimensions[0] == 0 or dimensions[1] == 0 or dimensions[2] == 0:
-                raise ValueError("No valid DICOM data found")
-
-            print(f"DICOM data dimensions: {dimensions}")
-            print(f"Number of slices: {dimensions[2]}")
-
-            # Update viewer
-            self.update_viewer()
+            self.start_loading(dicom_files=self.dicom_files)
 
         except Exception as e:
-            print(f"Error loading DICOM series: {str(e)}")
-            self.slice_text_actor.GetMapper().SetInput(f"Error: {str(e)}")
-            self.image_viewer.Render()
-
-    def load_dicom_archive(self, file_paths):
-        """Load DICOM files from a list of paths"""
-        # Verify all files exist first
-        valid_files = [f for f in file_paths if os.path.exists(f)]
-
-        if not valid_files:
-            error_msg = "No valid DICOM files found"
-            print(error_msg)
-            self.slice_text_actor.GetMapper().SetInput(error_msg)
-            self.image_viewer.Render()
-            return
+            self._on_series_failed(str(e))
 
-        try:
-
-            # self.dicom_files = file_paths
-            self.dicom_folder = self.app_data_dir
+    def load_dicom_datasets(self, fetch_datasets, window_settings=None, cache_path=None, cache_key=None):
+        """Load a series whose datasets fetch_datasets() returns on the loader thread,
+        window_settings skips the WW/WL lookup and the volume is saved to cache_path under
+        cache_key when given, returns whether the load was started"""
+        if self._loading:
+            return False
 
-            # Create reader
-            self.reader = vtkDICOMImageReader()
-            self.reader.SetDirectoryName(self.dicom_folder)
-            self.reader.Update()
-
-            # Verify data
-            dimensions = self.reader.GetOutput().GetDimensions()
-            if dimensions[0] == 0 or dimensions[1] == 0 or dimensions[2] == 0:
-                raise ValueError("No valid DICOM data found")
+        self.dicom_folder = ""
+        self.dicom_files = []
+        return self.start_loading(fetch_datasets=fetch_datasets, window_settings=window_settings,
+                                  cache_path=cache_path, cache_key=cache_key)
 
-            print(f"Loaded {len(file_paths)} DICOM files")
-            print(f"DICOM data dimensions: {dimensions}")
+    def load_dicom_volume(self, volume, spacing, window_settings):
+        """Load a volume from the volume cache, returns whether the load was started"""
+        if self._loading:
+            return False
 
-            self.update_viewer()
-            self.slice_text_actor.GetMapper().SetInput(f"Loaded {len(file_paths)} DICOM images")
-            self.image_viewer.Render()
+        self.dicom_folder = ""
+        self.dicom_files = []
+        return self.start_loading(volume=volume, spacing=spacing, window_settings=window_settings)
+
+    def start_loading(self, dicom_files=None, fetch_datasets=None, volume=None, spacing=None,
+                      window_settings=None, cache_path=None, cache_key=None):
+        """Read the series on a background thread, _on_series_loaded installs it,
+        returns whether the load was started"""
+        if self._loading:
+            return False
+        self._loading = True
+        self._load_source = next(source for source in (dicom_files, fetch_datasets, volume) if source is not None)
+
+        # Placeholder until the worker reports back. vtkImageViewer2.Render() does
+        # nothing without an input, so render the window directly
+        self.slice_text_actor.GetMapper().SetInput("Loading DICOM series...")
+        self.vtk_widget.GetRenderWindow().Render()
 
-        except Exception as e:
-            print(f"Error loading DICOM files: {str(e)}")
-            self.slice_text_actor.GetMapper().SetInput(f"Error: {str(e)}")
-            self.image_viewer.Render()
+        self._load_thread = QThread(self)
+        self._load_threads.add(self._load_thread)
+        self._load_worker = DicomLoadWorker(dicom_files, fetch_datasets, volume, spacing,
+                                            window_settings, cache_path, cache_key)
+        self._load_worker.moveToThread(self._load_thread)
+
+        self._load_thread.started.connect(self._load_worker.run)
+        self._load_worker.finished.connect(self._on_series_loaded)
+        self._load_worker.failed.connect(self._on_series_failed)
+        self._load_worker.finished.connect(self._load_thread.quit)
+        self._load_worker.failed.connect(self._load_thread.quit)
+        self._load_thread.finished.connect(partial(self._load_threads.discard, self._load_thread))
+        self._load_thread.finished.connect(self._load_worker.deleteLater)
+        self._load_thread.finished.connect(self._load_thread.deleteLater)
+
+        self._load_thread.start()
+        return True
+
+    def wait_for_loaders(self):
+        """Block until every loader thread has exited, Qt aborts when a running QThread is destroyed"""
+        for thread in list(self._load_threads):
+            thread.quit()
+            thread.wait()
+
+    @Slot(object, object, float, float, bool)
+    def _on_series_loaded(self, volume, image_data, window_width, window_level, window_computed):
+        """Install the image data produced by DicomLoadWorker"""
+        self._loading = False
+
+        dimensions = image_data.GetDimensions()
+        print(f"DICOM data dimensions: {dimensions}")
+        print(f"Number of slices: {dimensions[2]}")
+
+        self.volume = volume
+        self.image_data = image_data
+        self.reslice.SetInputData(image_data)
+        self.window_width = window_width
+        self.window_level = window_level
+
+        # Update viewer
+        self.update_viewer()
+        self.series_loaded.emit(self._load_source, window_width, window_level, window_computed)
+        self._load_source = None
+
+    @Slot(str)
+    def _on_series_failed(self, message):
+        self._loading = False
+        self._load_source = None
+        print(f"Error loading DICOM series: {message}")
+        self.slice_text_actor.GetMapper().SetInput(f"Error: {message}")
+        self.vtk_widget.GetRenderWindow().Render()
 
     def change_orientation(self, orientation):
         """Change the viewing orientation"""
         self.view_orientation = orientation.lower()
-        if hasattr(self, 'reader') and self.reader:
+        if self.image_data is not None:
             self.update_viewer()
 
     def update_viewer(self):
         """Update the viewer with current orientation"""
-        if not hasattr(self, 'reader') or not self.reader:
+        if self.image_data is None:
             return
 
-        # Clear previous reslice if it exists
-        if hasattr(self, 'reslice'):
-            del self.reslice
+        # SetSliceOrientation and SetSlice render whenever the viewer has an input,
+        # detach it while they run so only the Render() below draws
+        self.image_viewer.SetInputData(None)
 
         # Handle orientation
         if self.view_orientation == 'axial':
-            self.image_viewer.SetInputConnection(self.reader.GetOutputPort())
             self.image_viewer.SetSliceOrientationToXY()
-        else:
-            self.reslice = vtkImageReslice()
-            self.reslice.SetInputConnection(self.reader.GetOutputPort())
-            self.reslice.SetOutputSpacing(1, 1, 1)
-            self.reslice.SetInterpolationModeToLinear()
-
-            if self.view_orientation == 'coronal':
-                self.reslice.SetResliceAxesDirectionCosines(1, 0, 0, 0, 0, 1, 0, -1, 0)
-                self.image_viewer.SetSliceOrientationToXZ()
-            elif self.view_orientation == 'sagittal':
-                self.reslice.SetResliceAxesDirectionCosines(0, 1, 0, 0, 0, 1, 1, 0, 0)
-                self.image_viewer.SetSliceOrientationToYZ()
-
-            self.image_viewer.SetInputConnection(self.reslice.GetOutputPort())
+        elif self.view_orientation == 'coronal':
+            self.reslice.SetResliceAxesDirectionCosines(1, 0, 0, 0, 0, 1, 0, -1, 0)
+            self.image_viewer.SetSliceOrientationToXZ()
+        elif self.view_orientation == 'sagittal':
+            self.reslice.SetResliceAxesDirectionCosines(0, 1, 0, 0, 0, 1, 1, 0, 0)
+            self.image_viewer.SetSliceOrientationToYZ()
 
         # Apply window/level settings to the mapper
-        self.image_viewer.SetColorWindow(self.window_width)
-        self.image_viewer.SetColorLevel(self.window_level)
-
-        # Configure interactor
-        self.image_viewer.SetRenderWindow(self.vtk_widget.GetRenderWindow())
-        self.image_viewer.SetupInteractor(self.interactor)
-
-        # Set custom interactor style
-        self.interactor_style = CustomInteractorStyle(self.image_viewer, self.slice_text_actor)
-        self.interactor.SetInteractorStyle(self.interactor_style)
+        if self.image_viewer.GetColorWindow() != self.window_width:
+            self.image_viewer.SetColorWindow(self.window_width)
+        if self.image_viewer.GetColorLevel() != self.window_level:
+            self.image_viewer.SetColorLevel(self.window_level)
 
-        # Set initial slice
+        # Set initial slice, attaching the input keeps it as the displayed extent
+        self.image_viewer.SetSlice(0)
+        if self.view_orientation == 'axial':
+            self.image_viewer.SetInputData(self.image_data)
+        else:
+            self.image_viewer.SetInputConnection(self.reslice.GetOutputPort())
+        # Only renders if the input's extent doesn't start at 0
         self.image_viewer.SetSlice(self.image_viewer.GetSliceMin())
-        self.interactor_style.slice = self.image_viewer.GetSliceMin()
-        self.interactor_style.min_slice = self.image_viewer.GetSliceMin()
-        self.interactor_style.max_slice = self.image_viewer.GetSliceMax()
-        self.interactor_style.update_status_message()
+        self.interactor_style.reset_slice_range()
 
-        # Render
-        self.image_viewer.Render()
+        # Render once, after the camera has been fitted to the new data
         self.image_viewer.GetRenderer().ResetCamera()
-        self.vtk_widget.GetRenderWindow().Render()
+        self.image_viewer.Render()
 
     def show_archive_viewer(self):
         """Show the DICOM archive viewer dialog"""
@@ -377,12 +706,19 @@ class DICOMArchiveViewer(QWidget):
         self.setGeometry(100, 100, 800, 600)
 
         # MongoDB connection
-        self.client = MongoClient(MONGODB_URL)
+        self.client = get_mongo()
         self.db = self.client['radiology-db']
         self.patients = self.db['patients']
         self.studies = self.db['studies']
         self.series = self.db['series']
         self.instances = self.db['instances']
+        self.fs = gridfs.GridFS(self.db)
+
+        # (series id, dataset fetch) whose WW/WL should be stored once the viewer has computed it
+        self.pending_window = None
+        self.parent_viewer.series_loaded.connect(self.on_series_loaded)
+        # Writes the computed WW/WL back to MongoDB off the UI thread
+        self.db_writer = ThreadPoolExecutor(max_workers=1)
 
         self.setup_ui()
         self.refresh_studies()
@@ -437,13 +773,25 @@ class DICOMArchiveViewer(QWidget):
 
     def refresh_studies(self):
         """Refresh the list of studies from MongoDB"""
+        # Repaint once after the rows are filled in rather than per row, rows keep the
+        # created_at order from the query
+        self.tree_view.setUpdatesEnabled(False)
         self.model.removeRows(0, self.model.rowCount())
 
         try:
-            studies = self.studies.find().sort('created_at', -1)
-
-            for study in studies:
-                patient = self.patients.find_one({"_id": study["patient_id"]})
+            studies = list(self.studies.find(
+                {}, {"patient_id": 1, "study_date": 1, "study_description": 1}
+            ).sort('created_at', -1))
+
+            # Fetch every patient in one query instead of one per study
+            patient_ids = list({study["patient_id"] for study in studies})
+            patients = {patient["_id"]: patient for patient in self.patients.find(
+                {"_id": {"$in": patient_ids}}, {"patient_id": 1, "name": 1}
+            )}
+
+            self.model.setRowCount(len(studies))
+            for i, study in enumerate(studies):
+                patient = patients.get(study["patient_id"], {})
                 study_date = study.get('study_date', '')
                 if study_date:
                     study_date = f"{study_date[:4]}-{study_date[4:6]}-{study_date[6:8]}"
@@ -458,23 +806,33 @@ class DICOMArchiveViewer(QWidget):
                 # Store the study ID as data in the first column
                 row[0].setData(str(study['_id']), Qt.UserRole)
 
-                self.model.appendRow(row)
+                for col, item in enumerate(row):
+                    self.model.setItem(i, col, item)
 
             self.status_label.setText(f"Loaded {self.model.rowCount()} studies")
 
         except Exception as e:
+            self.model.removeRows(0, self.model.rowCount())
             self.status_label.setText(f"Error loading studies: {str(e)}")
 
+        finally:
+            self.tree_view.setUpdatesEnabled(True)
+
     def on_study_double_click(self, index):
         """Handle double-click on a study to load its images"""
         study_id = self.model.itemFromIndex(index.siblingAtColumn(0)).data(Qt.UserRole)
 
+        if self.parent_viewer._loading:
+            self.status_label.setText("A series is still loading, try again when it has finished")
+            return
+
         try:
-            study = self.studies.find_one({"_id": ObjectId(study_id)})
+            study = self.studies.find_one({"_id": ObjectId(study_id)}, {"study_uid": 1})
 
             # Get all series for this study, sorted by series number
             series_list = list(self.series.find(
-                {"study_uid": study["study_uid"]}
+                {"study_uid": study["study_uid"]},
+                {"series_number": 1, "window_width": 1, "window_level": 1}
             ).sort("series_number", 1))
 
             if not series_list:
@@ -484,93 +842,131 @@ class DICOMArchiveViewer(QWidget):
             # Get first series (lowest series number)
             first_series = series_list[0]
 
-            # Get all instances for this series, sorted by instance number
+            # Get the instances for this series, sorted by instance number. Inline
+            # dicom_file blobs are left out here and fetched in batches when parsed
             instances_list = list(self.instances.find(
-                {"series_id": first_series["_id"]}
+                {"series_id": first_series["_id"]},
+                {"instance_number": 1, "dicom_file_id": 1}
             ).sort("instance_number", 1))
 
             if not instances_list:
                 self.status_label.setText("No DICOM instances found for this series")
                 return
 
+            # Reopening a study skips the pixel download when its volume is cached. The key
+            # changes when the first series is replaced or gains or loses instances
+            cache_path = os.path.join(self.parent_viewer.app_data_dir, f"{study['study_uid']}.npy")
+            cache_key = {"series_id": str(first_series["_id"]), "instance_count": len(instances_list)}
+            cached = load_cached_volume(cache_path, cache_key)
+            if cached:
+                volume, spacing, window_settings = cached
+                self.parent_viewer.load_dicom_volume(volume, spacing, window_settings)
+                return
+
             # Prepare the DICOM files for display
-            self.prepare_dicom_viewer(instances_list)
+            self.prepare_dicom_viewer(instances_list, first_series, cache_path, cache_key)
 
         except Exception as e:
             self.status_label.setText(f"Error loading study: {str(e)}")
 
-    def prepare_dicom_viewer(self, instances):
-        temp_files = []
+    def read_instance_dataset(self, instance):
+        """Parse one GridFS-backed instance straight from MongoDB, returns a list with the dataset"""
         try:
-            for i, instance in enumerate(instances):
-                try:
-                    filename = os.path.join(self.parent_viewer.app_data_dir, f"instance_{i+1:04d}.dcm")
-                    print(f"Writing to: {filename}")
-
-                    # Verify DICOM data before writing
-                    if not instance.get('dicom_file'):
-                        print(f"Skipping empty DICOM data at index {i}")
-                        continue
-
-                    print(f"Writing {len(instance['dicom_file'])} bytes to {filename}")
-
-                    # Write and immediately flush/close
-                    with open(filename, 'wb') as f:
-                        f.write(instance['dicom_file'])
-                        f.flush()
-                        os.fsync(f.fileno())
-
-                    # Verify file exists and has content
-                    if os.path.exists(filename):
-                        size = os.path.getsize(filename)
-                        print(f"Successfully wrote {size} bytes to {filename}")
-                        temp_files.append(filename)
-                    else:
-                        print(f"ERROR: File not found after writing!")
+            # GridOut is file-like, pydicom reads its chunks directly
+            grid_out = self.fs.get(instance['dicom_file_id'])
+            ds = pydicom.dcmread(grid_out)
+            del grid_out
+            return [ds]
+        except Exception as e:
+            print(f"Error reading instance {instance['_id']}: {str(e)}")
+            return []
 
-                except Exception as e:
-                    print(f"Error creating file {i}: {str(e)}")
+    def read_inline_datasets(self, instance_ids):
+        """Parse a batch of instances that keep their bytes inline, one query per batch"""
+        datasets = []
+        try:
+            for blob in self.instances.find({"_id": {"$in": instance_ids}}, {"dicom_file": 1}):
+                if not blob.get('dicom_file'):
+                    print(f"Skipping empty DICOM data for instance {blob['_id']}")
                     continue
-
-            # Additional verification
-            print(f"\nDirectory listing after writes:")
-            for f in os.listdir(self.parent_viewer.app_data_dir):
-                print(f"Found: {f}")
-
-                if not temp_files:
-                    raise ValueError("No valid DICOM files were created")
-
-                # Verify at least one DICOM file is valid
                 try:
-                    test_file = temp_files[0]
-                    ds = pydicom.dcmread(test_file)
-                    print(f"First file validation: Modality={ds.Modality}, SOPClassUID={ds.SOPClassUID}")
+                    datasets.append(pydicom.dcmread(io.BytesIO(blob['dicom_file'])))
                 except Exception as e:
-                    print(f"DICOM validation failed: {str(e)}")
-                    shutil.rmtree(temp_dir)
-                    raise ValueError("Invalid DICOM data in first file")
-
-                # Sort files by instance number
-                temp_files.sort(key=lambda x: self.get_instance_number(x))
-                print(temp_files)
-
-                # Load the DICOM files into the viewer
-                self.parent_viewer.load_dicom_archive(temp_files)
+                    print(f"Error reading instance {blob['_id']}: {str(e)}")
+        except Exception as e:
+            print(f"Error reading instance batch: {str(e)}")
+        return datasets
+
+    def read_instance_datasets(self, instances):
+        """Download and parse a series' instances in parallel, runs on the loader thread"""
+        # Older uploads keep the bytes inline in the instance document, fetch those with
+        # $in batches instead of one round trip each
+        inline_ids = [instance['_id'] for instance in instances if not instance.get('dicom_file_id')]
+        inline_batches = [inline_ids[i:i + INLINE_BATCH_SIZE] for i in range(0, len(inline_ids), INLINE_BATCH_SIZE)]
+        gridfs_instances = [instance for instance in instances if instance.get('dicom_file_id')]
+
+        # stack_datasets sorts by InstanceNumber, so the order here doesn't matter
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            parsed = list(executor.map(self.read_instance_dataset, gridfs_instances))
+            parsed += executor.map(self.read_inline_datasets, inline_batches)
+            datasets = [ds for batch in parsed for ds in batch]
+
+        if not datasets:
+            raise ValueError("No valid DICOM instances were read")
+
+        ds = datasets[0]
+        print(f"First instance: Modality={ds.get('Modality', '')}, SOPClassUID={ds.get('SOPClassUID', '')}")
+        return datasets
+
+    def prepare_dicom_viewer(self, instances, series, cache_path=None, cache_key=None):
+        # Instances are parsed in memory now, drop .dcm files left by earlier versions
+        self.parent_viewer.clear_cache()
 
+        try:
+            # The download and parse run on DicomLoadWorker, not on the UI thread
+            fetch_datasets = partial(self.read_instance_datasets, instances)
+
+            # Reuse the WW/WL stored on the series by an earlier load
+            window_settings = None
+            if series.get('window_width') is not None and series.get('window_level') is not None:
+                window_settings = (series['window_width'], series['window_level'])
+
+            # Load the datasets into the viewer
+            self.pending_window = None
+            if not self.parent_viewer.load_dicom_datasets(fetch_datasets, window_settings,
+                                                          cache_path, cache_key):
+                self.status_label.setText("A series is still loading, try again when it has finished")
+                return
 
-            if temp_files:
-                self.parent_viewer.set_ww_wl()
+            if window_settings is None:
+                self.pending_window = (series['_id'], fetch_datasets)
 
         except Exception as e:
             print(f"Error preparing DICOM viewer: {str(e)}")
 
-    def get_instance_number(self, filepath):
+    def on_series_loaded(self, source, window_width, window_level, window_computed):
+        """Store the computed WW/WL on the series so later loads skip it"""
+        if self.pending_window is None:
+            return
+        series_id, fetch_datasets = self.pending_window
+        self.pending_window = None
+        if source is not fetch_datasets:
+            # Something other than our archive series finished loading
+            return
+        if not window_computed:
+            # The defaults stood in for a failed lookup, leave the series to be looked at again
+            return
+        self.db_writer.submit(self.store_window_settings, series_id, window_width, window_level)
+
+    def store_window_settings(self, series_id, window_width, window_level):
+        """Write WW/WL to the series document, runs on db_writer"""
         try:
-            ds = pydicom.dcmread(filepath, stop_before_pixels=True)
-            return int(getattr(ds, 'InstanceNumber', 0))
+            self.series.update_one(
+                {"_id": series_id},
+                {"$set": {"window_width": window_width, "window_level": window_level}}
+            )
         except Exception as e:
-            print(f"Error reading instance number from {filepath}: {e}")
-            return 0
+            print(f"Error caching window settings: {str(e)}")
 
 
 class MainWindow(QMainWindow):
@@ -583,6 +979,11 @@ class MainWindow(QMainWindow):
         self.dicom_viewer = DICOMViewerWidget()
         self.setCentralWidget(self.dicom_viewer)
 
+    def closeEvent(self, event):
+        # Let a pending volume cache write finish before the viewer and its threads go away
+        self.dicom_viewer.wait_for_loaders()
+        super().closeEvent(event)
+
 
 
 if __name__ == "__main__":